@@ -4,15 +4,31 @@
 接收 Chrome Extension 发送的网页数据
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, Response
 from typing import List, Optional
 from datetime import datetime
-import json
+import asyncio
+import base64
+import binascii
+import msgspec
 import os
+import zstandard
+import queue
+import threading
 
-app = FastAPI(title="金融数据采集 API", version="1.0.0")
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+# 响应统一用 orjson 编码（C 实现，比 stdlib json 快数倍）
+app = FastAPI(
+    title="金融数据采集 API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 
 # 配置 CORS - 允许 Chrome Extension 访问
 app.add_middleware(
@@ -27,17 +43,63 @@ app.add_middleware(
 DATA_DIR = "collected_data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# 文件名中需要替换的字符（预先构建翻译表，顺带挡住路径穿越）
+_FILENAME_TR = str.maketrans({'.': '_', ':': '_', '/': '_', '\\': '_'})
+
+# 域名/用户 ID 在文件名中的最大长度：加上时间戳、分隔符和各类
+# sidecar 后缀后仍需留在 NAME_MAX(255) 以内
+_FILENAME_PART_MAX = 100
+
+# 请求体大小上限（默认 64MB），防止超大 html_snapshot 把 worker 内存打爆
+MAX_BODY_BYTES = int(os.environ.get("MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+
 
-# 数据模型定义
-class Asset(BaseModel):
+@app.middleware("http")
+async def limit_body_size(request: Request, call_next):
+    """按 Content-Length 提前拒绝超限请求，不等整个 body 读完"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > MAX_BODY_BYTES:
+            return ORJSONResponse(status_code=413, content={"detail": "请求体过大"})
+    return await call_next(request)
+
+
+# 数据模型定义（msgspec.Struct：C 解码器直接解析为类型化对象，无中间字典）
+class Asset(msgspec.Struct):
     type: str  # "canvas_chart" 或 "image"
     base64: Optional[str] = None
     src_url: Optional[str] = None
     width: Optional[int] = None
     height: Optional[int] = None
+    path: Optional[str] = None  # base64 解码后另存的 sidecar 文件路径
+
+
+# 成功响应的固定形状：类型化 Struct 直接由 msgspec 编码，
+# 不再逐请求构造嵌套字典、也不走 FastAPI 的序列化链
+class IngestStats(msgspec.Struct):
+    total_assets: int
+    canvas_charts: int
+    images: int
+    html_size: int
+
+
+class IngestMetadata(msgspec.Struct):
+    user_id: str
+    domain: str
+    title: str
+    source_url: str
+    captured_at: str
+
 
+class IngestReply(msgspec.Struct):
+    success: bool
+    message: str
+    filepath: str
+    stats: IngestStats
+    metadata: IngestMetadata
 
-class IngestRequest(BaseModel):
+
+class IngestRequest(msgspec.Struct):
     user_id: str
     source_url: str
     domain: str
@@ -45,6 +107,204 @@ class IngestRequest(BaseModel):
     html_snapshot: str
     captured_at: str
     assets: List[Asset] = []
+    html_path: Optional[str] = None  # 压缩后 HTML sidecar 文件路径
+    html_size: Optional[int] = None  # 压缩前 HTML 原始大小（字符数）
+
+
+def _write_payload(filepath: str, payload: bytes) -> None:
+    """同步写入序列化后的数据（在线程池中执行，避免阻塞事件循环）"""
+    with open(filepath, "wb") as f:
+        f.write(payload)
+
+
+class _UringOp:
+    """一次待提交的写入：目标路径、数据，以及完成后要通知的 Future"""
+
+    __slots__ = ("filepath", "payload", "future", "loop")
+
+    def __init__(self, filepath, payload, future, loop):
+        self.filepath = filepath
+        self.payload = payload
+        self.future = future
+        self.loop = loop
+
+
+class IoUringBatchEngine:
+    """基于 io_uring 的批量写入引擎（每个 worker 进程一个 ring）
+
+    后台守护线程把排队的写入批量填入 SQE 后一次性提交，
+    单次 io_uring_enter 系统调用即可覆盖整批写入，
+    突发采集时摊薄系统调用开销、改善尾延迟。
+    """
+
+    QUEUE_DEPTH = 256
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._ring = liburing.Ring()
+        liburing.io_uring_queue_init(self.QUEUE_DEPTH, self._ring, 0)
+        self._cqe = liburing.Cqe()
+        self._inflight = {}
+        self._next_id = 0
+        # 每累计多少次写入就追加一次 fsync，摊薄设备屏障开销
+        self._sync_every = int(os.environ.get("SYNC_EVERY", "32"))
+        self._writes_since_sync = 0
+        self._thread = threading.Thread(
+            target=self._run, name="io-uring-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, filepath: str, payload: bytes) -> asyncio.Future:
+        """排队一次写入，返回可 await 的 Future（写入字节数）"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put(_UringOp(filepath, payload, future, loop))
+        return future
+
+    def is_alive(self) -> bool:
+        """写入线程是否存活（死亡时调用方应退回线程池写入）"""
+        return self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            # 阻塞等第一个请求，再尽量多收一批（不超过半个 ring）
+            ops = [self._queue.get()]
+            while len(ops) < self.QUEUE_DEPTH // 2:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # 任何意外异常都不能杀死写入线程：通知未完成的 Future 后继续
+            try:
+                self._submit_batch(ops)
+                self._reap()
+            except Exception as e:
+                self._fail_inflight(e)
+
+    def _fail_inflight(self, error: Exception):
+        """批量提交/收割出错时，关闭 fd 并让所有挂起的 Future 收到异常"""
+        for op, fd in self._inflight.values():
+            if fd is not None:
+                os.close(fd)
+            if op is not None:
+                op.loop.call_soon_threadsafe(op.future.set_exception, error)
+        self._inflight.clear()
+
+    def _submit_batch(self, ops):
+        for op in ops:
+            try:
+                fd = os.open(op.filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            except Exception as e:
+                # 打开失败只影响这一个请求；不止 OSError——
+                # 路径里混入 NUL 字节时 os.open 抛的是 ValueError
+                op.loop.call_soon_threadsafe(op.future.set_exception, e)
+                continue
+            sqe = liburing.io_uring_get_sqe(self._ring)
+            liburing.io_uring_prep_write(sqe, fd, op.payload, 0)
+            op_id = self._next_id
+            self._next_id += 1
+            liburing.io_uring_sqe_set_data64(sqe, op_id)
+            self._writes_since_sync += 1
+            if self._writes_since_sync >= self._sync_every:
+                # 写入与 fsync 用 IOSQE_IO_LINK 串联：fsync 在该次写入
+                # 完成后才执行，fd 等 fsync 的 CQE 回来再关闭
+                liburing.io_uring_sqe_set_flags(sqe, liburing.IOSQE_IO_LINK)
+                self._inflight[op_id] = (op, None)
+                fsync_sqe = liburing.io_uring_get_sqe(self._ring)
+                liburing.io_uring_prep_fsync(fsync_sqe, fd, 0)
+                fsync_id = self._next_id
+                self._next_id += 1
+                liburing.io_uring_sqe_set_data64(fsync_sqe, fsync_id)
+                self._inflight[fsync_id] = (None, fd)
+                self._writes_since_sync = 0
+            else:
+                self._inflight[op_id] = (op, fd)
+        liburing.io_uring_submit(self._ring)
+
+    def _reap(self):
+        while self._inflight:
+            liburing.io_uring_wait_cqe(self._ring, self._cqe)
+            ready = liburing.io_uring_cq_ready(self._ring)
+            for i in range(ready):
+                entry = self._cqe[i]
+                pending = self._inflight.pop(entry.user_data, None)
+                if pending is None:
+                    # 批次异常后残留 SQE 产生的完成事件，对应的
+                    # Future 已在 _fail_inflight 里收到异常，跳过即可
+                    continue
+                op, fd = pending
+                if fd is not None:
+                    os.close(fd)
+                if op is None:
+                    continue  # fsync 的完成事件，没有要通知的 Future
+                if entry.res < 0:
+                    error = OSError(-entry.res, os.strerror(-entry.res), op.filepath)
+                    op.loop.call_soon_threadsafe(op.future.set_exception, error)
+                elif entry.res < len(op.payload):
+                    # 短写也视为失败，不能当成功静默吞掉
+                    error = OSError(
+                        f"短写 {op.filepath}: {entry.res}/{len(op.payload)} 字节"
+                    )
+                    op.loop.call_soon_threadsafe(op.future.set_exception, error)
+                else:
+                    op.loop.call_soon_threadsafe(op.future.set_result, entry.res)
+            liburing.io_uring_cq_advance(self._ring, ready)
+
+
+def _init_write_engine():
+    """liburing 可用时启用批量写入引擎，否则退回线程池写入"""
+    if liburing is None:
+        return None
+    try:
+        return IoUringBatchEngine()
+    except OSError:
+        # 内核不支持 io_uring（或被禁用）时静默降级
+        return None
+
+
+_write_engine = _init_write_engine()
+
+
+async def _persist(filepath: str, payload: bytes) -> None:
+    """异步落盘：优先 io_uring 批量引擎，引擎不可用时退回线程池"""
+    if _write_engine is not None and _write_engine.is_alive():
+        await _write_engine.submit(filepath, payload)
+    else:
+        await asyncio.to_thread(_write_payload, filepath, payload)
+
+
+def _compress_html(html: str) -> bytes:
+    """zstd 压缩 HTML 快照（在线程池中执行，重复标记压缩率通常 8~15 倍）"""
+    return zstandard.ZstdCompressor(level=3).compress(html.encode("utf-8"))
+
+
+def _extract_asset_blobs(assets, filepath: str):
+    """把 data URL 形式的 base64 资源解码为待写入的 sidecar 文件
+
+    成功解码的资源其 base64 字段被清空、path 字段指向 sidecar 路径；
+    返回 (sidecar_path, blob) 列表供批量写入。
+    """
+    writes = []
+    for i, asset in enumerate(assets):
+        b64 = asset.base64
+        if not b64 or not b64.startswith("data:"):
+            continue
+        header, _, encoded = b64.partition(",")
+        if ";base64" not in header:
+            continue
+        try:
+            blob = base64.b64decode(encoded)
+        except (binascii.Error, ValueError):
+            # 数据损坏时保留原始 base64 不动
+            continue
+        # 扩展名来自请求方可控的 mime 头：只留 ASCII 字母数字并限长
+        ext = header[5:].split(";")[0].split("/")[-1]
+        ext = "".join(ch for ch in ext if ch.isascii() and ch.isalnum())[:10] or "bin"
+        sidecar_path = f"{filepath}.asset{i}.{ext}"
+        asset.base64 = None
+        asset.path = sidecar_path
+        writes.append((sidecar_path, blob))
+    return writes
 
 
 @app.get("/")
@@ -66,54 +326,97 @@ async def health_check():
 
 
 @app.post("/api/ingest/extension")
-async def ingest_extension_data(data: IngestRequest):
+async def ingest_extension_data(request: Request):
     """
     接收 Chrome Extension 发送的网页数据
-    
-    Args:
-        data: 包含网页快照、元数据和资源的请求体
-    
+
+    请求体由 msgspec 单趟解析并校验为类型化 Struct，
+    无 pydantic 逐字段分发、也无中间字典拷贝。
+
     Returns:
         成功响应，包含保存的文件路径
     """
+    # 分块读取并累计限额：Content-Length 缺失或谎报时同样兜底
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="请求体过大")
+        chunks.append(chunk)
+    body = b"".join(chunks)
+
+    try:
+        data = msgspec.json.decode(body, type=IngestRequest)
+    except msgspec.ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except msgspec.DecodeError:
+        raise HTTPException(status_code=400, detail="请求体不是合法的 JSON")
+
     try:
-        # 生成文件名（使用时间戳和域名）
+        # 生成文件名（使用时间戳和域名，经翻译表一次替换所有危险字符）
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_domain = data.domain.replace(".", "_")
-        filename = f"{timestamp}_{safe_domain}_{data.user_id}.json"
+        safe_domain = data.domain.translate(_FILENAME_TR)[:_FILENAME_PART_MAX]
+        safe_user = data.user_id.translate(_FILENAME_TR)[:_FILENAME_PART_MAX]
+        filename = f"{timestamp}_{safe_domain}_{safe_user}.json"
         filepath = os.path.join(DATA_DIR, filename)
         
-        # 将数据转换为字典
-        data_dict = data.dict()
-        
-        # 保存到文件
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data_dict, f, ensure_ascii=False, indent=2)
+        # base64 资源解码后写入独立 sidecar 文件，JSON 中只保留路径
+        sidecar_writes = _extract_asset_blobs(data.assets, filepath)
+
+        # HTML 快照压缩为 .html.zst sidecar，JSON 中只留路径和原始大小
+        html_size = len(data.html_snapshot)
+        if data.html_snapshot:
+            html_path = f"{filepath}.html.zst"
+            compressed = await asyncio.to_thread(_compress_html, data.html_snapshot)
+            sidecar_writes.append((html_path, compressed))
+            data.html_path = html_path
+            data.html_size = html_size
+            data.html_snapshot = ""
+
+        # 直接由 Struct 序列化为 JSON bytes，无中间字典
+        payload = msgspec.json.encode(data)
+
+        # 主文件和所有 sidecar 一起异步落盘
+        await asyncio.gather(
+            _persist(filepath, payload),
+            *(_persist(path, blob) for path, blob in sidecar_writes),
+        )
         
-        # 统计信息
+        # 统计信息（单次遍历，避免对大资源列表扫描三遍）
         assets_count = len(data.assets)
-        canvas_count = sum(1 for asset in data.assets if asset.type == "canvas_chart")
-        image_count = sum(1 for asset in data.assets if asset.type == "image")
+        canvas_count = image_count = 0
+        for asset in data.assets:
+            if asset.type == "canvas_chart":
+                canvas_count += 1
+            elif asset.type == "image":
+                image_count += 1
         
-        return {
-            "success": True,
-            "message": "数据已成功保存",
-            "filepath": filepath,
-            "stats": {
-                "total_assets": assets_count,
-                "canvas_charts": canvas_count,
-                "images": image_count,
-                "html_size": len(data.html_snapshot)
-            },
-            "metadata": {
-                "user_id": data.user_id,
-                "domain": data.domain,
-                "title": data.title,
-                "source_url": data.source_url,
-                "captured_at": data.captured_at
-            }
-        }
-    
+        reply = IngestReply(
+            success=True,
+            message="数据已成功保存",
+            filepath=filepath,
+            stats=IngestStats(
+                total_assets=assets_count,
+                canvas_charts=canvas_count,
+                images=image_count,
+                html_size=html_size,
+            ),
+            metadata=IngestMetadata(
+                user_id=data.user_id,
+                domain=data.domain,
+                title=data.title,
+                source_url=data.source_url,
+                captured_at=data.captured_at,
+            ),
+        )
+        return Response(
+            content=msgspec.json.encode(reply),
+            media_type="application/json",
+        )
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -129,14 +432,19 @@ async def options_ingest():
 
 if __name__ == "__main__":
     import uvicorn
-    
+
+    # 多 worker 并行处理 CPU 密集的 JSON 解析（每个 worker 独立进程、
+    # 独立事件循环和 io_uring ring，互不共享 GIL）
+    workers = os.cpu_count() * 2 + 1
+
     print("=" * 50)
     print("金融数据采集后端服务")
     print("=" * 50)
     print(f"API 文档: http://localhost:8000/docs")
     print(f"健康检查: http://localhost:8000/api/health")
     print(f"数据保存目录: {os.path.abspath(DATA_DIR)}")
+    print(f"Worker 进程数: {workers}")
     print("=" * 50)
-    
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    uvicorn.run("server:app", host="0.0.0.0", port=8000, workers=workers)
 
@@ -4,37 +4,111 @@
 用于浏览和查看已采集的网页数据
 """
 
-import json
+import functools
+import ijson
+import io
+import itertools
+import mmap
 import os
 import sys
+import zstandard
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 DATA_DIR = "collected_data"
 
 
-def list_all_files() -> List[str]:
-    """列出所有采集的数据文件"""
+def list_all_files() -> List[Tuple[str, int]]:
+    """列出所有采集的数据文件及其大小（单次 scandir，避免逐个 stat）"""
     if not os.path.exists(DATA_DIR):
         print(f"❌ 数据目录不存在: {DATA_DIR}")
         return []
-    
-    files = sorted([f for f in os.listdir(DATA_DIR) if f.endswith('.json')], reverse=True)
-    return files
+
+    with os.scandir(DATA_DIR) as it:
+        entries = [(e.name, e.stat().st_size) for e in it if e.name.endswith('.json')]
+    entries.sort(reverse=True)
+    return entries
+
+
+def _parse_skipping_blobs(buf) -> Dict:
+    """流式解析 JSON，丢弃大字段只记录其长度
+
+    html_snapshot 的长度记入 html_size（新格式记录会被后面的真实
+    html_size 字段覆盖），asset.base64 的长度记入 base64_size。
+    """
+    data = {}
+    assets = []
+    current = None
+    for prefix, event, value in ijson.parse(buf):
+        if prefix == 'html_snapshot':
+            if value:
+                data['html_size'] = len(value)
+        elif prefix == 'assets.item':
+            if event == 'start_map':
+                current = {}
+                assets.append(current)
+        elif prefix.startswith('assets.item.'):
+            if event in ('string', 'number', 'boolean', 'null'):
+                key = prefix.rsplit('.', 1)[1]
+                if key == 'base64':
+                    if value:
+                        current['base64_size'] = len(value)
+                else:
+                    current[key] = value
+        elif prefix and '.' not in prefix:
+            if event in ('string', 'number', 'boolean', 'null'):
+                data[prefix] = value
+    data['assets'] = assets
+    return data
 
 
 def load_file(filename: str) -> Dict:
-    """加载 JSON 文件"""
+    """加载 JSON 文件（mmap + 流式解析，跳过 html_snapshot / base64 正文）
+
+    摘要和资源列表不需要大字段正文，跳过后超大文件也能秒开；
+    需要 HTML 原文时由 get_html 按需读取。
+    """
     filepath = os.path.join(DATA_DIR, filename)
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(filepath, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) as mm:
+                return _parse_skipping_blobs(mm)
     except Exception as e:
         print(f"❌ 读取文件失败: {e}")
         return None
 
 
+def _load_inline_html(filename: str) -> str:
+    """旧格式记录：流式定位内嵌的 html_snapshot 字段，取到即返回"""
+    filepath = os.path.join(DATA_DIR, filename)
+    try:
+        with open(filepath, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) as mm:
+                for prefix, event, value in ijson.parse(mm):
+                    if prefix == 'html_snapshot':
+                        return value or ''
+    except Exception as e:
+        print(f"❌ 读取文件失败: {e}")
+    return ''
+
+
+def get_html(data: Dict, filename: str) -> str:
+    """按需获取 HTML 快照：优先解压 .html.zst sidecar，否则回读内嵌字段"""
+    html_path = data.get('html_path')
+    if html_path and os.path.exists(html_path):
+        try:
+            with open(html_path, 'rb') as f:
+                return zstandard.ZstdDecompressor().decompress(f.read()).decode('utf-8')
+        except Exception as e:
+            print(f"❌ 解压 HTML sidecar 失败: {e}")
+            return ''
+
+    if data.get('html_snapshot'):
+        return data['html_snapshot']
+    return _load_inline_html(filename)
+
+
 def format_size(size_bytes: int) -> str:
     """格式化文件大小"""
     for unit in ['B', 'KB', 'MB', 'GB']:
@@ -44,17 +118,52 @@ def format_size(size_bytes: int) -> str:
     return f"{size_bytes:.1f} TB"
 
 
-def show_summary(data: Dict, filename: str) -> None:
+@functools.lru_cache(maxsize=32)
+def _load_summary(filename: str) -> Dict:
+    """加载文件并计算摘要统计，按文件名缓存（采集文件写入后不再变化）
+
+    加载失败抛出 OSError——lru_cache 不会缓存抛异常的调用，
+    临时读取失败（比如服务端还在写入）不会污染整个会话的缓存。
+    """
+    data = load_file(filename)
+    if data is None:
+        raise OSError(f"无法加载 {filename}")
+
+    # 单次遍历统计两类资源
+    canvas_count = image_count = 0
+    for a in data.get('assets', []):
+        asset_type = a.get('type')
+        if asset_type == 'canvas_chart':
+            canvas_count += 1
+        elif asset_type == 'image':
+            image_count += 1
+
+    return {
+        'data': data,
+        'file_size': os.path.getsize(os.path.join(DATA_DIR, filename)),
+        'canvas_count': canvas_count,
+        'image_count': image_count,
+    }
+
+
+def _summary(filename: str) -> Dict:
+    """获取文件摘要，失败时返回 None（且不会被缓存，下次可重试）"""
+    try:
+        return _load_summary(filename)
+    except OSError:
+        return None
+
+
+def show_summary(summary: Dict, filename: str) -> None:
     """显示数据摘要"""
+    data = summary['data']
+
     print("\n" + "=" * 60)
     print("📄 文件信息")
     print("=" * 60)
     print(f"文件名: {filename}")
-    
-    filepath = os.path.join(DATA_DIR, filename)
-    file_size = os.path.getsize(filepath)
-    print(f"文件大小: {format_size(file_size)}")
-    
+    print(f"文件大小: {format_size(summary['file_size'])}")
+
     print("\n" + "-" * 60)
     print("📋 元数据")
     print("-" * 60)
@@ -63,21 +172,17 @@ def show_summary(data: Dict, filename: str) -> None:
     print(f"标题: {data.get('title', 'N/A')}")
     print(f"URL: {data.get('source_url', 'N/A')}")
     print(f"采集时间: {data.get('captured_at', 'N/A')}")
-    
+
     print("\n" + "-" * 60)
     print("📊 资源统计")
     print("-" * 60)
     assets = data.get('assets', [])
     print(f"总资源数: {len(assets)}")
-    
-    canvas_count = sum(1 for a in assets if a.get('type') == 'canvas_chart')
-    image_count = sum(1 for a in assets if a.get('type') == 'image')
-    
-    print(f"  - Canvas 图表: {canvas_count}")
-    print(f"  - 图片: {image_count}")
-    
-    html_snapshot = data.get('html_snapshot', '')
-    print(f"\nHTML 快照大小: {format_size(len(html_snapshot))}")
+    print(f"  - Canvas 图表: {summary['canvas_count']}")
+    print(f"  - 图片: {summary['image_count']}")
+
+    html_size = data.get('html_size') or len(data.get('html_snapshot', ''))
+    print(f"\nHTML 快照大小: {format_size(html_size)}")
     
     # 显示资源详情（前10个）
     if assets:
@@ -88,12 +193,11 @@ def show_summary(data: Dict, filename: str) -> None:
             asset_type = asset.get('type', 'unknown')
             width = asset.get('width', '?')
             height = asset.get('height', '?')
-            has_base64 = 'base64' in asset and asset.get('base64')
+            base64_size = asset.get('base64_size', 0)
             has_url = 'src_url' in asset and asset.get('src_url')
-            
+
             print(f"{i}. [{asset_type}] {width}x{height}", end="")
-            if has_base64:
-                base64_size = len(asset.get('base64', ''))
+            if base64_size:
                 print(f" | Base64: {format_size(base64_size)}", end="")
             if has_url:
                 print(f" | URL: {asset.get('src_url', '')[:50]}...", end="")
@@ -121,20 +225,19 @@ def show_assets(data: Dict) -> None:
         if asset.get('width') and asset.get('height'):
             print(f"尺寸: {asset.get('width')} x {asset.get('height')}")
         
-        if asset.get('base64'):
-            base64_data = asset.get('base64', '')
-            size = len(base64_data)
-            print(f"Base64 数据: {format_size(size)}")
-            if base64_data.startswith('data:image'):
-                print(f"格式: {base64_data.split(';')[0].split(':')[1]}")
+        if asset.get('base64_size'):
+            print(f"Base64 数据: {format_size(asset.get('base64_size'))}")
         
+        if asset.get('path'):
+            print(f"Sidecar 文件: {asset.get('path')}")
+
         if asset.get('src_url'):
             print(f"源URL: {asset.get('src_url')}")
 
 
-def show_html_preview(data: Dict, lines: int = 50) -> None:
+def show_html_preview(data: Dict, filename: str, lines: int = 50) -> None:
     """显示 HTML 快照预览"""
-    html = data.get('html_snapshot', '')
+    html = get_html(data, filename)
     if not html:
         print("\n⚠️  没有 HTML 快照")
         return
@@ -143,17 +246,24 @@ def show_html_preview(data: Dict, lines: int = 50) -> None:
     print("📄 HTML 快照预览（前50行）")
     print("=" * 60)
     
-    html_lines = html.split('\n')
-    for i, line in enumerate(html_lines[:lines], 1):
+    # 只取前 N 行，不为整个快照物化一份按行切分的列表
+    buf = io.StringIO(html)
+    shown = list(itertools.islice(buf, lines))
+    for i, line in enumerate(shown, 1):
+        line = line.rstrip('\n')
         print(f"{i:4d} | {line[:100]}{'...' if len(line) > 100 else ''}")
-    
-    if len(html_lines) > lines:
-        print(f"\n... 还有 {len(html_lines) - lines} 行未显示")
+
+    pos = buf.tell()
+    if len(shown) == lines and pos < len(html):
+        remaining = html.count('\n', pos)
+        if not html.endswith('\n'):
+            remaining += 1  # 末行没有换行符
+        print(f"\n... 还有 {remaining} 行未显示")
 
 
 def save_html(data: Dict, filename: str) -> None:
     """保存 HTML 快照到独立文件"""
-    html = data.get('html_snapshot', '')
+    html = get_html(data, filename)
     if not html:
         print("\n⚠️  没有 HTML 快照可保存")
         return
@@ -174,81 +284,86 @@ def main():
     print("\n" + "=" * 60)
     print("🔍 采集数据查看工具")
     print("=" * 60)
-    
-    # 列出所有文件
-    files = list_all_files()
-    
-    if not files:
-        print(f"\n⚠️  在 {DATA_DIR} 目录中没有找到任何数据文件")
-        return
-    
-    print(f"\n📁 找到 {len(files)} 个数据文件:\n")
-    for i, filename in enumerate(files, 1):
-        filepath = os.path.join(DATA_DIR, filename)
-        file_size = os.path.getsize(filepath)
-        print(f"  {i}. {filename} ({format_size(file_size)})")
-    
-    # 如果只有一个文件，直接显示
-    if len(files) == 1:
-        filename = files[0]
-        print(f"\n自动加载: {filename}")
-    else:
-        # 让用户选择文件
-        try:
-            choice = input(f"\n请选择要查看的文件 (1-{len(files)})，或按 Enter 查看最新文件: ").strip()
-            if choice == "":
-                filename = files[0]
-            else:
-                idx = int(choice) - 1
-                if 0 <= idx < len(files):
-                    filename = files[idx]
-                else:
-                    print("❌ 无效的选择")
-                    return
-        except (ValueError, KeyboardInterrupt):
-            print("\n❌ 操作已取消")
-            return
-    
-    # 加载文件
-    print(f"\n正在加载: {filename}...")
-    data = load_file(filename)
-    
-    if not data:
-        return
-    
-    # 显示摘要
-    show_summary(data, filename)
-    
-    # 交互式菜单
+
+    # 外层循环：文件选择（选项 4 回到这里，不再递归）
     while True:
-        print("\n" + "=" * 60)
-        print("📋 操作菜单")
-        print("=" * 60)
-        print("1. 查看所有资源详情")
-        print("2. 预览 HTML 快照")
-        print("3. 保存 HTML 到文件")
-        print("4. 返回文件列表")
-        print("0. 退出")
-        
-        try:
-            choice = input("\n请选择操作: ").strip()
-            
-            if choice == "1":
-                show_assets(data)
-            elif choice == "2":
-                show_html_preview(data)
-            elif choice == "3":
-                save_html(data, filename)
-            elif choice == "4":
-                main()  # 重新开始
+        files = list_all_files()
+
+        if not files:
+            print(f"\n⚠️  在 {DATA_DIR} 目录中没有找到任何数据文件")
+            return
+
+        print(f"\n📁 找到 {len(files)} 个数据文件:\n")
+        for i, (filename, file_size) in enumerate(files, 1):
+            print(f"  {i}. {filename} ({format_size(file_size)})")
+
+        # 如果只有一个文件，直接显示
+        if len(files) == 1:
+            filename = files[0][0]
+            print(f"\n自动加载: {filename}")
+        else:
+            # 让用户选择文件
+            try:
+                choice = input(f"\n请选择要查看的文件 (1-{len(files)})，或按 Enter 查看最新文件: ").strip()
+                if choice == "":
+                    filename = files[0][0]
+                else:
+                    idx = int(choice) - 1
+                    if 0 <= idx < len(files):
+                        filename = files[idx][0]
+                    else:
+                        print("❌ 无效的选择")
+                        return
+            except (ValueError, KeyboardInterrupt):
+                print("\n❌ 操作已取消")
                 return
-            elif choice == "0":
-                print("\n👋 再见！")
+
+        # 加载文件（摘要按文件名缓存，重复进入不再重新扫描）
+        print(f"\n正在加载: {filename}...")
+        summary = _summary(filename)
+
+        if not summary:
+            return
+
+        data = summary['data']
+
+        # 显示摘要
+        show_summary(summary, filename)
+
+        # 交互式菜单
+        back_to_list = False
+        while True:
+            print("\n" + "=" * 60)
+            print("📋 操作菜单")
+            print("=" * 60)
+            print("1. 查看所有资源详情")
+            print("2. 预览 HTML 快照")
+            print("3. 保存 HTML 到文件")
+            print("4. 返回文件列表")
+            print("0. 退出")
+
+            try:
+                choice = input("\n请选择操作: ").strip()
+
+                if choice == "1":
+                    show_assets(data)
+                elif choice == "2":
+                    show_html_preview(data, filename)
+                elif choice == "3":
+                    save_html(data, filename)
+                elif choice == "4":
+                    back_to_list = True
+                    break
+                elif choice == "0":
+                    print("\n👋 再见！")
+                    return
+                else:
+                    print("❌ 无效的选择，请重试")
+            except KeyboardInterrupt:
+                print("\n\n👋 再见！")
                 return
-            else:
-                print("❌ 无效的选择，请重试")
-        except KeyboardInterrupt:
-            print("\n\n👋 再见！")
+
+        if not back_to_list:
             return
 
 